@@ -1,23 +1,37 @@
 import os
+import time
 import datetime
+import threading
 import numpy as np
 import cv2
-from flask import Flask, render_template, request, redirect, url_for, flash, Response
+from flask import Flask, render_template, request, redirect, url_for, flash, Response, jsonify
 from werkzeug.security import generate_password_hash, check_password_hash
 from werkzeug.utils import secure_filename
 from flask_login import LoginManager, login_user, logout_user, login_required, current_user
 from models import db, User, Student, Attendance, Developer
+from database import init_database, read_session, commit_with_retry
 from face_utils import FaceRecognizer
+from kiosk import Kiosk, parse_sources
+from mjpeg import FrameEncoder, AdaptiveRate, StreamStats, StreamSettings
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'Anup@123')
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///face_recognition.db'
 app.config['UPLOAD_FOLDER'] = 'static/images/student_photos'
 app.config['DEVELOPER_FOLDER'] = 'static/images/developer_photos'
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024
+# Kiosk mode: comma separated camera indices, video files or RTSP URLs
+app.config['KIOSK_SOURCES'] = parse_sources(os.environ.get('KIOSK_SOURCES', ''))
+app.config['KIOSK_WORKERS'] = int(os.environ.get('KIOSK_WORKERS', 2))
+# MJPEG stream output: width 0 keeps the camera resolution
+app.config['STREAM_WIDTH'] = int(os.environ.get('STREAM_WIDTH', 640))
+app.config['STREAM_JPEG_QUALITY'] = int(os.environ.get('STREAM_JPEG_QUALITY', 80))
+app.config['STREAM_MIN_JPEG_QUALITY'] = int(os.environ.get('STREAM_MIN_JPEG_QUALITY', 40))
+app.config['STREAM_MAX_FPS'] = int(os.environ.get('STREAM_MAX_FPS', 15))
+app.config['STREAM_MIN_FPS'] = int(os.environ.get('STREAM_MIN_FPS', 3))
+app.config['STREAM_CHANGE_THRESHOLD'] = int(os.environ.get('STREAM_CHANGE_THRESHOLD', 3))
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg'}
 
-db.init_app(app)
+init_database(app)
 
 login_manager = LoginManager()
 login_manager.login_view = 'login'
@@ -81,7 +95,8 @@ def logout():
 @app.route('/dashboard')
 @login_required
 def dashboard():
-    students = Student.query.all()
+    with read_session() as session:
+        students = session.query(Student).all()
     return render_template('dashboard.html', students=students)
 
 @app.route('/student_register', methods=["GET","POST"])
@@ -105,6 +120,7 @@ def student_register():
                 new_student = Student(name=name, roll_no=roll_no, class_name=class_name, photo=unique_filename)
                 db.session.add(new_student)
                 db.session.commit()
+                update_kiosk_student(new_student.id)
                 flash("Student Registered!")
                 return redirect(url_for('dashboard'))
             except Exception as e:
@@ -150,36 +166,72 @@ def helpdesk():
     dev = Developer.query.first()
     return render_template('helpdesk.html', dev=dev)
 
+def encode_student_face(recognizer, student):
+    """Face encoding from a student's photo, None if it can't be read"""
+    try:
+        img_path = os.path.join(app.config['UPLOAD_FOLDER'], student.photo)
+        if os.path.exists(img_path):
+            img = cv2.imread(img_path)
+            if img is not None:
+                return recognizer.get_face_encoding(img)
+    except Exception as e:
+        print(f"Error loading face for student {student.id}: {e}")
+    return None
+
 def load_known_faces(recognizer):
     known_encodings = []
     known_ids = []
-    students = Student.query.all()
+    with read_session() as session:
+        students = session.query(Student).all()
     for s in students:
+        encoding = encode_student_face(recognizer, s)
+        if encoding is not None:
+            known_encodings.append(encoding)
+            known_ids.append(s.id)
+    return known_encodings, known_ids
+
+kiosk = None
+kiosk_lock = threading.Lock()
+
+def get_kiosk():
+    """The shared kiosk, started on first use, None when no sources are configured"""
+    global kiosk
+    if not app.config['KIOSK_SOURCES']:
+        return None
+    with kiosk_lock:
+        if kiosk is None:
+            kiosk = Kiosk(app, load_known_faces, encode_student_face, app.config['KIOSK_SOURCES'],
+                          workers=app.config['KIOSK_WORKERS'], settings=StreamSettings.from_config(app.config))
+        kiosk.start()
+    return kiosk
+
+def update_kiosk_student(student_id, removed=False):
+    if kiosk is not None:
         try:
-            img_path = os.path.join(app.config['UPLOAD_FOLDER'], s.photo)
-            if os.path.exists(img_path):
-                img = cv2.imread(img_path)
-                if img is not None:
-                    encoding = recognizer.get_face_encoding(img)
-                    if encoding is not None:
-                        known_encodings.append(encoding)
-                        known_ids.append(s.id)
+            if removed:
+                kiosk.remove_student(student_id)
+            else:
+                kiosk.update_student(student_id)
         except Exception as e:
-            print(f"Error loading face for student {s.id}: {e}")
-    return known_encodings, known_ids
+            app.logger.error(f"Kiosk gallery update error: {e}")
+
+@app.context_processor
+def inject_kiosk_enabled():
+    return {'kiosk_enabled': bool(app.config['KIOSK_SOURCES'])}
 
 @app.route('/attendance', methods=['GET', 'POST'])
 @login_required
 def attendance():
     date_filter = request.args.get('date') or request.form.get('date')
     
-    if date_filter:
-        records = Attendance.query.filter(Attendance.time.like(f"{date_filter}%")).order_by(Attendance.time.desc()).all()
-    else:
-        records = Attendance.query.order_by(Attendance.time.desc()).all()
-    
-    student_ids = [r.student_id for r in records]
-    students = {s.id: s for s in Student.query.filter(Student.id.in_(student_ids)).all()}
+    with read_session() as session:
+        query = session.query(Attendance)
+        if date_filter:
+            query = query.filter(Attendance.time.like(f"{date_filter}%"))
+        records = query.order_by(Attendance.time.desc()).all()
+        
+        student_ids = [r.student_id for r in records]
+        students = {s.id: s for s in session.query(Student).filter(Student.id.in_(student_ids)).all()}
     enriched = []
     for r in records:
         s = students.get(r.student_id)
@@ -198,6 +250,7 @@ def delete_student(id):
                 os.remove(photo_path)
             db.session.delete(student)
             db.session.commit()
+            update_kiosk_student(id, removed=True)
             flash("Student deleted successfully!")
         except Exception as e:
             flash(f"Error: {str(e)}")
@@ -250,6 +303,7 @@ def edit_student(id):
                 flash(f"Error: {str(e)}")
         
         db.session.commit()
+        update_kiosk_student(student.id)
         flash("Student updated successfully!")
         return redirect(url_for('dashboard'))
     
@@ -334,9 +388,7 @@ def mark_attendance_photo():
                 flash(f"Attendance already marked for {student.name} today!")
             else:
                 time_str = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                att = Attendance(student_id=student_id, time=time_str)
-                db.session.add(att)
-                db.session.commit()
+                commit_with_retry(lambda: db.session.add(Attendance(student_id=student_id, time=time_str)))
                 flash(f"Attendance marked successfully for {student.name}!")
         else:
             flash("Face not recognized! Please register first.")
@@ -351,9 +403,20 @@ def mark_attendance_photo():
 @app.route('/video_feed')
 @login_required
 def video_feed():
+    # If a kiosk camera already holds device 0, share its stream instead of opening it again
+    k = get_kiosk()
+    camera = k.camera_for_source(0) if k is not None else None
+    if camera is not None:
+        return Response(camera.stream(), mimetype='multipart/x-mixed-replace; boundary=frame')
+
+    settings = StreamSettings.from_config(app.config)
+
     def gen():
         cam = None
         recognizer = None
+        encoder = FrameEncoder(settings)
+        rate = AdaptiveRate(settings)
+        stats = StreamStats('video_feed', rate, encoder)
         try:
             with app.app_context():
                 recognizer = FaceRecognizer()
@@ -410,9 +473,7 @@ def video_feed():
                                         if student_id not in marked_today:
                                             try:
                                                 time_str = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                                                att = Attendance(student_id=student_id, time=time_str)
-                                                db.session.add(att)
-                                                db.session.commit()
+                                                commit_with_retry(lambda: db.session.add(Attendance(student_id=student_id, time=time_str)))
                                                 marked_today.add(student_id)
                                                 attendance_marked = True
                                                 app.logger.info(f"Attendance marked for {name}")
@@ -431,14 +492,17 @@ def video_feed():
                     if cv2.waitKey(1) & 0xFF == 13:
                         break
 
-                    ret, jpeg = cv2.imencode('.jpg', frame)
-                    if ret:
-                        frame_bytes = jpeg.tobytes()
-                        yield (b'--frame\r\nContent-Type: image/jpeg\r\n\r\n' + frame_bytes + b'\r\n')
+                    # Skip frames the client isn't ready for, but always show the final one
+                    if attendance_marked or rate.due():
+                        part, encode_time = encoder.encode(frame, rate.quality, check_changed=not attendance_marked)
+                        if part is not None:
+                            stats.record(part, encode_time)
+                            start = time.perf_counter()
+                            yield part
+                            rate.sent(time.perf_counter() - start)
                     
                     # Auto close after attendance marked
                     if attendance_marked:
-                        import time
                         time.sleep(2)
                         break
                         
@@ -449,8 +513,35 @@ def video_feed():
                 cam.release()
             if recognizer is not None:
                 recognizer.release()
+            stats.close()
+            app.logger.info(f"Video feed closed: {stats.report()}")
 
     return Response(gen(), mimetype='multipart/x-mixed-replace; boundary=frame')
 
+@app.route('/kiosk')
+@login_required
+def kiosk_page():
+    k = get_kiosk()
+    if k is None:
+        flash("Kiosk mode is off. Set KIOSK_SOURCES to enable it.")
+        return redirect(url_for('face_recognition_page'))
+    return render_template('kiosk.html', cameras=k.cameras)
+
+@app.route('/kiosk_feed/<int:index>')
+@login_required
+def kiosk_feed(index):
+    k = get_kiosk()
+    camera = k.camera(index) if k is not None else None
+    if camera is None:
+        return "Camera not found", 404
+    return Response(camera.stream(), mimetype='multipart/x-mixed-replace; boundary=frame')
+
+@app.route('/stream_stats')
+@login_required
+def stream_stats():
+    return jsonify(StreamStats.all_reports())
+
 if __name__ == '__main__':
+    # Kiosk cameras mark attendance whether or not anyone is watching
+    get_kiosk()
     app.run(debug=False, host='0.0.0.0', port=int(os.environ.get('PORT', 5000)))
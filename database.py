@@ -0,0 +1,124 @@
+import os
+import random
+import sqlite3
+import time
+from contextlib import contextmanager
+from flask import current_app
+from sqlalchemy import create_engine, event
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from models import db
+
+DEFAULT_DATABASE_URI = 'sqlite:///face_recognition.db'
+
+
+def database_uri():
+    """Database URL from DATABASE_URL, falling back to the local SQLite file"""
+    uri = os.environ.get('DATABASE_URL') or DEFAULT_DATABASE_URI
+    # Render and Heroku hand out postgres:// which SQLAlchemy no longer accepts
+    if uri.startswith('postgres://'):
+        uri = 'postgresql://' + uri[len('postgres://'):]
+    return uri
+
+
+def configure_database(app):
+    """Fill in database settings from the environment"""
+    config = app.config
+    config['SQLALCHEMY_DATABASE_URI'] = database_uri()
+    config['DB_BUSY_TIMEOUT_MS'] = int(os.environ.get('DB_BUSY_TIMEOUT_MS', 5000))
+    config['DB_SYNCHRONOUS'] = os.environ.get('DB_SYNCHRONOUS', 'NORMAL').upper()
+    if config['DB_SYNCHRONOUS'] not in ('OFF', 'NORMAL', 'FULL', 'EXTRA'):
+        raise ValueError(f"Invalid DB_SYNCHRONOUS: {config['DB_SYNCHRONOUS']}")
+    config['DB_CACHE_SIZE_KB'] = int(os.environ.get('DB_CACHE_SIZE_KB', 20000))
+    config['DB_RETRIES'] = int(os.environ.get('DB_RETRIES', 5))
+    config['DB_RETRY_DELAY'] = float(os.environ.get('DB_RETRY_DELAY', 0.05))
+
+    if config['SQLALCHEMY_DATABASE_URI'].startswith('sqlite'):
+        config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+            # pysqlite's own busy wait, in seconds
+            'connect_args': {'timeout': config['DB_BUSY_TIMEOUT_MS'] / 1000, 'check_same_thread': False},
+        }
+    else:
+        config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+            'pool_size': int(os.environ.get('DB_POOL_SIZE', 5)),
+            'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', 10)),
+            'pool_recycle': int(os.environ.get('DB_POOL_RECYCLE', 1800)),
+            'pool_pre_ping': True,
+        }
+
+
+def _sqlite_pragmas(config, read_only=False):
+    def set_pragmas(dbapi_connection, connection_record):
+        if not isinstance(dbapi_connection, sqlite3.Connection):
+            return
+        cursor = dbapi_connection.cursor()
+        # WAL lets readers carry on while a writer commits
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute(f"PRAGMA synchronous={config['DB_SYNCHRONOUS']}")
+        cursor.execute(f"PRAGMA busy_timeout={config['DB_BUSY_TIMEOUT_MS']}")
+        # Negative cache_size is in KiB rather than pages
+        cursor.execute(f"PRAGMA cache_size=-{config['DB_CACHE_SIZE_KB']}")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+        if read_only:
+            cursor.execute("PRAGMA query_only=ON")
+        cursor.close()
+    return set_pragmas
+
+
+def init_database(app):
+    """Bind the models to the app and set up the write and read-only engines"""
+    configure_database(app)
+    db.init_app(app)
+    with app.app_context():
+        engine = db.engine
+        in_memory = isinstance(engine.pool, StaticPool) or engine.url.database in (None, '', ':memory:')
+        if engine.dialect.name == 'sqlite':
+            event.listen(engine, 'connect', _sqlite_pragmas(app.config))
+        if engine.dialect.name == 'sqlite' and in_memory:
+            # A second engine would open a separate, empty in-memory database
+            read_engine = engine
+        elif engine.dialect.name == 'sqlite':
+            # Listing pages get their own pool of query_only connections
+            read_engine = create_engine(engine.url, **app.config['SQLALCHEMY_ENGINE_OPTIONS'])
+            event.listen(read_engine, 'connect', _sqlite_pragmas(app.config, read_only=True))
+        elif engine.dialect.name == 'postgresql':
+            read_engine = engine.execution_options(postgresql_readonly=True)
+        else:
+            # Other servers have no portable read-only switch, so reads share the main pool
+            read_engine = engine
+    app.extensions['read_engine'] = read_engine
+    app.extensions['read_session'] = sessionmaker(bind=read_engine, expire_on_commit=False)
+
+
+@contextmanager
+def read_session():
+    """Session on a read-only connection, for pages that only list records"""
+    session = current_app.extensions['read_session']()
+    try:
+        yield session
+    finally:
+        # close() hands the connection back without expiring the loaded rows
+        session.close()
+
+
+def is_busy_error(error):
+    message = str(getattr(error, 'orig', error)).lower()
+    return 'locked' in message or 'busy' in message
+
+
+def commit_with_retry(work):
+    """Run work() and commit, retrying with backoff while the database is busy"""
+    retries = current_app.config['DB_RETRIES']
+    delay = current_app.config['DB_RETRY_DELAY']
+    for attempt in range(retries + 1):
+        try:
+            result = work()
+            db.session.commit()
+            return result
+        except OperationalError as e:
+            db.session.rollback()
+            if attempt == retries or not is_busy_error(e):
+                raise
+            current_app.logger.warning(f"Database busy, retrying ({attempt + 1}/{retries})")
+            time.sleep(delay * (2 ** attempt) * random.uniform(0.5, 1.5))
@@ -0,0 +1,4 @@
+def post_worker_init(worker):
+    # Start kiosk cameras in the server only, not in scripts that import the app
+    from app import get_kiosk
+    get_kiosk()
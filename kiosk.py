@@ -0,0 +1,429 @@
+import datetime
+import queue
+import threading
+import time
+import numpy as np
+import cv2
+from models import db, Student, Attendance
+from database import read_session, commit_with_retry
+from face_utils import FaceRecognizer
+from mjpeg import FrameEncoder, AdaptiveRate, StreamStats, StreamSettings
+
+
+def parse_sources(value):
+    """Parse a comma separated source list into capture arguments"""
+    sources = []
+    for item in (value or '').split(','):
+        item = item.strip()
+        if not item:
+            continue
+        # Plain numbers are device indices, anything else is a file or URL
+        sources.append(int(item) if item.isdigit() else item)
+    return sources
+
+
+class Gallery:
+    """Known student faces and today's attendance, shared by all workers"""
+
+    def __init__(self, app, loader, encoder):
+        self.app = app
+        self.loader = loader
+        self.encoder = encoder
+        self.lock = threading.Lock()
+        self.known_encodings = []
+        self.known_ids = []
+        self.names = {}
+        self.marked_today = set()
+        self.day = None
+
+    def load(self, recognizer):
+        """Load student encodings and today's attendance from the database"""
+        with self.app.app_context():
+            known_encodings, known_ids = self.loader(recognizer)
+            today = datetime.datetime.now().date()
+            with read_session() as session:
+                names = {s.id: s.name for s in session.query(Student).filter(Student.id.in_(known_ids)).all()}
+                marked_today = {a.student_id for a in session.query(Attendance).filter(
+                    Attendance.time.like(f"{today}%")
+                ).all()}
+        with self.lock:
+            self.known_encodings = known_encodings
+            self.known_ids = known_ids
+            self.names = names
+            # Merge rather than replace, so marks still being committed aren't lost
+            if self.day == today:
+                self.marked_today |= marked_today
+            else:
+                self.marked_today = marked_today
+            self.day = today
+        self.app.logger.info(f"Kiosk gallery loaded {len(known_encodings)} student faces")
+
+    def update_student(self, recognizer, student_id):
+        """Re-encode one student's photo after it was added or edited"""
+        with self.app.app_context():
+            with read_session() as session:
+                student = session.get(Student, student_id)
+            encoding = self.encoder(recognizer, student) if student is not None else None
+        with self.lock:
+            # Build new lists so match() can keep using the old ones without the lock
+            pairs = [(e, i) for e, i in zip(self.known_encodings, self.known_ids) if i != student_id]
+            names = {i: n for i, n in self.names.items() if i != student_id}
+            if encoding is not None:
+                pairs.append((encoding, student_id))
+                names[student_id] = student.name
+            self.known_encodings = [e for e, _ in pairs]
+            self.known_ids = [i for _, i in pairs]
+            self.names = names
+
+    def remove_student(self, student_id):
+        """Forget a deleted student"""
+        with self.lock:
+            pairs = [(e, i) for e, i in zip(self.known_encodings, self.known_ids) if i != student_id]
+            self.known_encodings = [e for e, _ in pairs]
+            self.known_ids = [i for _, i in pairs]
+            self.names = {i: n for i, n in self.names.items() if i != student_id}
+
+    def match(self, recognizer, face_encoding):
+        """Return (student_id, name) for a face encoding, or (None, None)"""
+        with self.lock:
+            known_encodings = self.known_encodings
+            known_ids = self.known_ids
+            names = self.names
+        if not known_encodings:
+            return None, None
+        matches = recognizer.compare_faces(known_encodings, face_encoding, tolerance=0.85)
+        face_distances = recognizer.face_distance(known_encodings, face_encoding)
+        best_index = np.argmin(face_distances)
+        if matches[best_index] and face_distances[best_index] < 0.15:
+            student_id = known_ids[best_index]
+            return student_id, names.get(student_id)
+        return None, None
+
+    def mark(self, student_id):
+        """Mark attendance once per day, returns True if a record was added"""
+        today = datetime.datetime.now().date()
+        with self.lock:
+            if self.day != today:
+                self.marked_today = set()
+                self.day = today
+            if student_id in self.marked_today:
+                return False
+            self.marked_today.add(student_id)
+
+        def add_if_unmarked():
+            # Other pages and workers mark attendance too, so the database has the final say
+            existing = Attendance.query.filter(
+                Attendance.student_id == student_id,
+                Attendance.time.like(f"{today}%")
+            ).first()
+            if existing:
+                return False
+            time_str = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            db.session.add(Attendance(student_id=student_id, time=time_str))
+            return True
+
+        try:
+            with self.app.app_context():
+                return commit_with_retry(add_if_unmarked)
+        except Exception as e:
+            with self.lock:
+                self.marked_today.discard(student_id)
+            self.app.logger.error(f"Kiosk attendance error: {e}")
+            return False
+
+
+class CameraSource:
+    """Reads frames from one capture source and publishes them to viewers"""
+
+    def __init__(self, index, source, logger, settings=None, reconnect_delay=2.0):
+        self.index = index
+        self.source = source
+        self.logger = logger
+        self.settings = settings or StreamSettings()
+        self.encoder = FrameEncoder(self.settings)
+        self.reconnect_delay = reconnect_delay
+        self.condition = threading.Condition()
+        self.frame = None
+        self.frame_id = 0
+        self.processed_id = 0
+        self.results = []
+        self.display = None
+        self.display_id = 0
+        self.viewers = 0
+        self.running = False
+        self.thread = None
+
+    @property
+    def name(self):
+        return f"Camera {self.index + 1}"
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self._run, name=f"kiosk-camera-{self.index}", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        with self.condition:
+            self.condition.notify_all()
+        if self.thread is not None:
+            self.thread.join(timeout=5)
+
+    def _run(self):
+        while self.running:
+            cam = cv2.VideoCapture(self.source)
+            if not cam.isOpened():
+                self.logger.error(f"{self.name} could not open source {self.source!r}")
+                cam.release()
+                time.sleep(self.reconnect_delay)
+                continue
+            # Files play at their own frame rate instead of as fast as they decode
+            is_file = isinstance(self.source, str) and '://' not in self.source
+            fps = cam.get(cv2.CAP_PROP_FPS) if is_file else 0
+            delay = 1.0 / fps if fps and fps > 0 else 0
+            try:
+                while self.running:
+                    ret, frame = cam.read()
+                    if not ret:
+                        if is_file:
+                            # Loop video files so they can stand in for live streams
+                            cam.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                            ret, frame = cam.read()
+                        if not ret:
+                            break
+                    self._publish(frame)
+                    if delay:
+                        time.sleep(delay)
+            finally:
+                cam.release()
+            if self.running:
+                self.logger.warning(f"{self.name} lost source {self.source!r}, reconnecting")
+                time.sleep(self.reconnect_delay)
+
+    def _publish(self, frame):
+        with self.condition:
+            self.frame = frame
+            self.frame_id += 1
+            results = self.results
+            viewers = self.viewers
+        if not viewers:
+            return
+        annotated = frame.copy()
+        draw_results(annotated, results)
+        # Viewers encode lazily at their own quality, sharing the encoder's cache
+        with self.condition:
+            self.display = annotated
+            self.display_id += 1
+            self.condition.notify_all()
+
+    def take_frame(self):
+        """Return (frame_id, frame) if a frame arrived since the last inference"""
+        with self.condition:
+            if self.frame is None or self.frame_id == self.processed_id:
+                return None, None
+            self.processed_id = self.frame_id
+            return self.frame_id, self.frame
+
+    def set_results(self, results):
+        with self.condition:
+            self.results = results
+
+    def stream(self):
+        """Generate MJPEG parts for one viewer"""
+        with self.condition:
+            self.viewers += 1
+        rate = AdaptiveRate(self.settings)
+        stats = StreamStats(self.name, rate, self.encoder)
+        try:
+            last_id = 0
+            while self.running:
+                rate.wait()
+                with self.condition:
+                    self.condition.wait_for(lambda: self.display_id != last_id or not self.running, timeout=5)
+                    if not self.running:
+                        break
+                    if self.display_id == last_id:
+                        continue
+                    last_id = self.display_id
+                    frame = self.display
+                part, encode_time = self.encoder.encode(frame, rate.quality, frame_id=last_id)
+                if part is None:
+                    continue
+                stats.record(part, encode_time)
+                start = time.perf_counter()
+                yield part
+                rate.sent(time.perf_counter() - start)
+        finally:
+            with self.condition:
+                self.viewers -= 1
+            stats.close()
+            self.logger.info(f"{self.name} viewer closed: {stats.report()}")
+
+
+def draw_results(frame, results):
+    """Draw recognition boxes and names onto a frame"""
+    if results:
+        cv2.putText(frame, "Face Detected!", (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
+    for (top, right, bottom, left), name, color in results:
+        cv2.rectangle(frame, (left,top), (right,bottom), color, 3)
+        cv2.rectangle(frame, (left,bottom-35), (right,bottom), color, cv2.FILLED)
+        cv2.putText(frame, name, (left+6,bottom-6), cv2.FONT_HERSHEY_DUPLEX, 0.8, (255,255,255), 2)
+
+
+class InferenceScheduler:
+    """Round-robins camera frames across a fixed pool of inference workers"""
+
+    def __init__(self, cameras, gallery, logger, workers=2, idle_delay=0.01):
+        self.cameras = cameras
+        self.gallery = gallery
+        self.logger = logger
+        self.workers = max(1, workers)
+        self.idle_delay = idle_delay
+        # A free slot is taken before a frame, so every dispatched frame goes
+        # straight to an idle worker instead of going stale in the queue
+        self.slots = threading.Semaphore(self.workers)
+        self.tasks = queue.Queue()
+        # Cameras with a frame in flight, so one camera can't hog every worker
+        self.busy = set()
+        self.busy_lock = threading.Lock()
+        self.threads = []
+        self.running = False
+
+    def start(self):
+        self.running = True
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f"kiosk-worker-{i}", daemon=True)
+            thread.start()
+            self.threads.append(thread)
+        thread = threading.Thread(target=self._dispatch, name="kiosk-scheduler", daemon=True)
+        thread.start()
+        self.threads.append(thread)
+
+    def stop(self):
+        self.running = False
+        for thread in self.threads:
+            thread.join(timeout=5)
+        self.threads = []
+
+    def _dispatch(self):
+        busy = self.busy
+        busy_lock = self.busy_lock
+        next_camera = 0
+        while self.running:
+            if not self.slots.acquire(timeout=0.5):
+                continue
+            dispatched = False
+            for offset in range(len(self.cameras)):
+                camera = self.cameras[(next_camera + offset) % len(self.cameras)]
+                with busy_lock:
+                    if camera.index in busy:
+                        continue
+                frame_id, frame = camera.take_frame()
+                if frame is None:
+                    continue
+                with busy_lock:
+                    busy.add(camera.index)
+                self.tasks.put((camera, frame))
+                next_camera = (next_camera + offset + 1) % len(self.cameras)
+                dispatched = True
+                break
+            if not dispatched:
+                self.slots.release()
+                time.sleep(self.idle_delay)
+
+    def _work(self):
+        recognizer = FaceRecognizer()
+        try:
+            while self.running:
+                try:
+                    camera, frame = self.tasks.get(timeout=0.5)
+                except queue.Empty:
+                    continue
+                try:
+                    camera.set_results(self.recognize(recognizer, frame, camera))
+                except Exception as e:
+                    self.logger.error(f"Kiosk inference error on {camera.name}: {e}")
+                finally:
+                    with self.busy_lock:
+                        self.busy.discard(camera.index)
+                    self.slots.release()
+        finally:
+            recognizer.release()
+
+    def recognize(self, recognizer, frame, camera):
+        """Detect and identify faces in a frame, marking attendance on a match"""
+        face_locations = recognizer.detect_faces(frame)
+        face_encodings = recognizer.get_face_encodings(frame, face_locations)
+        results = []
+        for face_encoding, loc in zip(face_encodings, face_locations):
+            name = "Unknown"
+            color = (0, 0, 255)
+            student_id, student_name = self.gallery.match(recognizer, face_encoding)
+            if student_id is not None:
+                name = student_name or "Student"
+                color = (0, 255, 0)
+                if self.gallery.mark(student_id):
+                    self.logger.info(f"Attendance marked for {name} on {camera.name}")
+            results.append((loc, name, color))
+        return results
+
+
+class Kiosk:
+    """Several cameras sharing one gallery and one inference worker pool"""
+
+    def __init__(self, app, loader, encoder, sources, workers=2, settings=None):
+        self.app = app
+        self.gallery = Gallery(app, loader, encoder)
+        self.cameras = [CameraSource(i, source, app.logger, settings) for i, source in enumerate(sources)]
+        self.scheduler = InferenceScheduler(self.cameras, self.gallery, app.logger, workers=workers)
+        self.lock = threading.Lock()
+        self.started = False
+
+    def start(self):
+        with self.lock:
+            if self.started:
+                return
+            recognizer = FaceRecognizer()
+            try:
+                self.gallery.load(recognizer)
+            finally:
+                recognizer.release()
+            for camera in self.cameras:
+                camera.start()
+            self.scheduler.start()
+            self.started = True
+
+    def stop(self):
+        with self.lock:
+            if not self.started:
+                return
+            self.scheduler.stop()
+            for camera in self.cameras:
+                camera.stop()
+            self.started = False
+
+    def update_student(self, student_id):
+        """Refresh one student in the gallery after they are added or edited"""
+        if not self.started:
+            return
+        recognizer = FaceRecognizer()
+        try:
+            self.gallery.update_student(recognizer, student_id)
+        finally:
+            recognizer.release()
+
+    def remove_student(self, student_id):
+        if self.started:
+            self.gallery.remove_student(student_id)
+
+    def camera(self, index):
+        if 0 <= index < len(self.cameras):
+            return self.cameras[index]
+        return None
+
+    def camera_for_source(self, source):
+        """The kiosk camera reading a given source, e.g. device 0"""
+        for camera in self.cameras:
+            if camera.source == source:
+                return camera
+        return None
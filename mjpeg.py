@@ -0,0 +1,206 @@
+import threading
+import time
+import cv2
+
+PART_HEADER = b'--frame\r\nContent-Type: image/jpeg\r\n\r\n'
+PART_FOOTER = b'\r\n'
+
+
+class StreamSettings:
+    """Output size, JPEG quality and frame rate limits for MJPEG streams"""
+
+    def __init__(self, width=640, quality=80, min_quality=40, max_fps=15, min_fps=3, change_threshold=3):
+        self.width = width
+        self.quality = quality
+        self.min_quality = min(min_quality, quality)
+        self.max_fps = max_fps
+        self.min_fps = min(min_fps, max_fps)
+        self.change_threshold = change_threshold
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(
+            width=config['STREAM_WIDTH'],
+            quality=config['STREAM_JPEG_QUALITY'],
+            min_quality=config['STREAM_MIN_JPEG_QUALITY'],
+            max_fps=config['STREAM_MAX_FPS'],
+            min_fps=config['STREAM_MIN_FPS'],
+            change_threshold=config['STREAM_CHANGE_THRESHOLD'],
+        )
+
+
+class FrameEncoder:
+    """Resizes and JPEG-encodes frames, reusing buffers and skipping unchanged frames"""
+
+    def __init__(self, settings):
+        self.settings = settings
+        self.lock = threading.Lock()
+        self.resized = None
+        self.thumb = None
+        # Encoded parts keyed by (content, quality); content numbers the distinct
+        # pictures seen, and contents maps each caller frame id to one of them
+        self.parts = {}
+        self.contents = {}
+        self.content = 0
+        self.encodes = 0
+        self.reused = 0
+        self.unchanged = 0
+
+    def resize(self, frame):
+        """Scale a frame down to the output width, reusing one buffer"""
+        h, w = frame.shape[:2]
+        width = self.settings.width
+        if not width or w <= width:
+            return frame
+        size = (width, int(h * width / w))
+        if self.resized is not None and (self.resized.shape[:2] != (size[1], size[0]) or self.resized.dtype != frame.dtype):
+            self.resized = None
+        self.resized = cv2.resize(frame, size, dst=self.resized, interpolation=cv2.INTER_AREA)
+        return self.resized
+
+    def _changed(self, frame, force=False):
+        # A tiny thumbnail is enough to tell sensor noise from real motion
+        thumb = cv2.resize(frame, (32, 24), interpolation=cv2.INTER_AREA)
+        if (not force and self.thumb is not None and self.thumb.shape == thumb.shape
+                and cv2.absdiff(thumb, self.thumb).max() <= self.settings.change_threshold):
+            return False
+        self.thumb = thumb
+        return True
+
+    def _new_content(self, resized, frame_id, check_changed):
+        if self._changed(resized, force=not check_changed) or not self.content:
+            self.content += 1
+            # Only the current and previous pictures can still be asked for
+            self.parts = {key: part for key, part in self.parts.items() if key[0] >= self.content - 1}
+            self.contents = {fid: c for fid, c in self.contents.items() if c >= self.content - 1}
+        else:
+            self.unchanged += 1
+        if frame_id is not None:
+            self.contents[frame_id] = self.content
+        return self.content
+
+    def encode(self, frame, quality=None, frame_id=None, check_changed=True):
+        """Return (multipart part bytes, seconds spent encoding) for a frame"""
+        # Viewers of one published frame pass its frame_id to share one part per quality
+        quality = quality or self.settings.quality
+        with self.lock:
+            start = time.perf_counter()
+            content = self.contents.get(frame_id) if frame_id is not None else None
+            if content is not None and (content, quality) in self.parts:
+                self.reused += 1
+                return self.parts[(content, quality)], 0.0
+            # One resize per frame, shared by the change check and the encoder
+            resized = self.resize(frame)
+            if content is None:
+                content = self._new_content(resized, frame_id, check_changed)
+            key = (content, quality)
+            part = self.parts.get(key)
+            if part is not None:
+                self.reused += 1
+                return part, 0.0
+            ret, jpeg = cv2.imencode('.jpg', resized, [cv2.IMWRITE_JPEG_QUALITY, quality])
+            if not ret:
+                return None, time.perf_counter() - start
+            # Join straight from the encoder's buffer instead of copying it with tobytes()
+            part = b''.join((PART_HEADER, jpeg.data, PART_FOOTER))
+            self.parts[key] = part
+            self.encodes += 1
+            return part, time.perf_counter() - start
+
+
+class AdaptiveRate:
+    """Per-client JPEG quality and frame rate driven by how fast the client reads"""
+
+    def __init__(self, settings):
+        self.settings = settings
+        self.quality = settings.quality
+        self.fps = float(settings.max_fps)
+        self.last_sent = 0.0
+
+    @property
+    def interval(self):
+        return 1.0 / self.fps if self.fps else 0.0
+
+    def due(self):
+        """True when the client is ready for another frame at the current rate"""
+        return time.perf_counter() - self.last_sent >= self.interval
+
+    def wait(self):
+        """Sleep until the next frame is due"""
+        remaining = self.interval - (time.perf_counter() - self.last_sent)
+        if remaining > 0:
+            time.sleep(remaining)
+
+    def sent(self, send_time):
+        """Adjust quality and frame rate from how long the client took to take a part"""
+        self.last_sent = time.perf_counter()
+        settings = self.settings
+        if send_time > self.interval:
+            # Client is falling behind, drop quality first and then frame rate
+            if self.quality > settings.min_quality:
+                self.quality = max(settings.min_quality, self.quality - 10)
+            else:
+                self.fps = max(settings.min_fps, self.fps * 0.75)
+        elif send_time < self.interval / 4:
+            if self.fps < settings.max_fps:
+                self.fps = min(settings.max_fps, self.fps + 1)
+            elif self.quality < settings.quality:
+                self.quality = min(settings.quality, self.quality + 5)
+
+
+class StreamStats:
+    """Encoded bytes per second and encode time for one client stream"""
+
+    active = {}
+    lock = threading.Lock()
+    next_id = 0
+
+    def __init__(self, name, rate=None, encoder=None):
+        with StreamStats.lock:
+            StreamStats.next_id += 1
+            self.id = StreamStats.next_id
+            StreamStats.active[self.id] = self
+        self.name = name
+        self.started = time.perf_counter()
+        self.frames = 0
+        self.bytes = 0
+        self.encode_time = 0.0
+        self.rate = rate
+        self.encoder = encoder
+
+    def record(self, part, encode_time):
+        self.frames += 1
+        self.bytes += len(part)
+        self.encode_time += encode_time
+
+    def report(self):
+        elapsed = max(time.perf_counter() - self.started, 1e-6)
+        report = {
+            'id': self.id,
+            'name': self.name,
+            'frames': self.frames,
+            'fps': round(self.frames / elapsed, 2),
+            'bytes_per_sec': int(self.bytes / elapsed),
+            'avg_encode_ms': round(self.encode_time * 1000 / self.frames, 2) if self.frames else 0.0,
+        }
+        if self.rate is not None:
+            report['quality'] = self.rate.quality
+            report['max_fps'] = round(self.rate.fps, 2)
+        if self.encoder is not None:
+            # Encoder totals, shared by every viewer of a kiosk camera
+            report['encoder'] = {
+                'encodes': self.encoder.encodes,
+                'reused': self.encoder.reused,
+                'unchanged': self.encoder.unchanged,
+            }
+        return report
+
+    def close(self):
+        with StreamStats.lock:
+            StreamStats.active.pop(self.id, None)
+
+    @classmethod
+    def all_reports(cls):
+        with cls.lock:
+            streams = list(cls.active.values())
+        return [s.report() for s in streams]
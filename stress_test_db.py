@@ -0,0 +1,161 @@
+"""
+Stress test for concurrent attendance writes
+Several worker processes mark attendance as fast as they can while the
+listing pages read, against a throwaway database.
+Run: python stress_test_db.py --workers 4 --threads 4 --seconds 10
+"""
+
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import threading
+import time
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Concurrent attendance write stress test")
+    parser.add_argument('--workers', type=int, default=4, help="writer processes")
+    parser.add_argument('--threads', type=int, default=4, help="writer threads per process")
+    parser.add_argument('--seconds', type=float, default=10, help="test duration")
+    parser.add_argument('--database', help="database URL (default: temporary SQLite file)")
+    return parser.parse_args()
+
+
+def write_loop(app, student_id, deadline, counts, index):
+    from models import db, Attendance
+    from database import commit_with_retry
+
+    with app.app_context():
+        while time.time() < deadline:
+            time_str = time.strftime("%Y-%m-%d %H:%M:%S")
+            try:
+                commit_with_retry(lambda: db.session.add(Attendance(student_id=student_id, time=time_str)))
+                counts[index][0] += 1
+            except Exception as e:
+                counts[index][1] += 1
+                print(f"   ❌ Write failed: {e}")
+
+
+def worker(database_url, student_id, threads, seconds, ready, go, results):
+    # Spawned workers start fresh, so point them at the test database before importing the app
+    os.environ['DATABASE_URL'] = database_url
+    os.environ.pop('KIOSK_SOURCES', None)
+    from app import app
+
+    ready.put(True)
+    go.wait()
+    deadline = time.time() + seconds
+    counts = [[0, 0] for _ in range(threads)]
+    pool = [threading.Thread(target=write_loop, args=(app, student_id, deadline, counts, i)) for i in range(threads)]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    results.put((sum(c[0] for c in counts), sum(c[1] for c in counts)))
+
+
+def read_loop(app, deadline, counts):
+    from models import Attendance
+    from database import read_session
+
+    with app.app_context():
+        while time.time() < deadline:
+            try:
+                with read_session() as session:
+                    session.query(Attendance).order_by(Attendance.time.desc()).limit(100).all()
+                counts[0] += 1
+            except Exception as e:
+                counts[1] += 1
+                print(f"   ❌ Read failed: {e}")
+
+
+def main():
+    args = parse_args()
+    tmpdir = None
+    if args.database:
+        os.environ['DATABASE_URL'] = args.database
+    else:
+        tmpdir = tempfile.mkdtemp(prefix='attendance_stress_')
+        os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tmpdir, 'stress.db')
+    os.environ.pop('KIOSK_SOURCES', None)
+
+    print("🔍 Database Stress Test\n")
+    print(f"   Database: {os.environ['DATABASE_URL']}")
+    print(f"   Writers: {args.workers} processes x {args.threads} threads for {args.seconds:g}s\n")
+
+    from app import app
+    from models import db, Student, Attendance
+
+    with app.app_context():
+        student = Student(name="Stress Test", roll_no=f"stress-{int(time.time())}", class_name="-", photo="")
+        db.session.add(student)
+        db.session.commit()
+        student_id = student.id
+        # Orphan rows from deleted students can share a reused id, so only rows after this are ours
+        last_attendance_id = db.session.query(db.func.max(Attendance.id)).scalar() or 0
+        db.session.remove()
+
+    procs = []
+    try:
+        # spawn works on every platform, and gives each worker its own connections like gunicorn does
+        ctx = multiprocessing.get_context('spawn')
+        ready = ctx.Queue()
+        go = ctx.Event()
+        results = ctx.Queue()
+        procs = [ctx.Process(target=worker, args=(os.environ['DATABASE_URL'], student_id, args.threads,
+                                                  args.seconds, ready, go, results))
+                 for _ in range(args.workers)]
+        for p in procs:
+            p.start()
+        # Start the clock once every worker has finished importing the app
+        for _ in procs:
+            ready.get()
+        go.set()
+        start = time.time()
+        deadline = start + args.seconds
+
+        read_counts = [0, 0]
+        read_loop(app, deadline, read_counts)
+        elapsed = time.time() - start
+
+        writes = errors = 0
+        for _ in procs:
+            w, e = results.get()
+            writes += w
+            errors += e
+        for p in procs:
+            p.join()
+
+        print(f"   ✅ Attendance writes: {writes} ({writes / elapsed:.0f}/s)")
+        print(f"   ✅ Listing reads: {read_counts[0]} ({read_counts[0] / elapsed:.0f}/s)")
+        print(f"   {'❌' if errors or read_counts[1] else '✅'} Failed writes: {errors}, failed reads: {read_counts[1]}")
+    finally:
+        # Stop writers left running by an error or Ctrl+C before cleaning up after them
+        for p in procs:
+            if p.is_alive():
+                p.terminate()
+                p.join()
+        if not tmpdir:
+            # Leave a real database the way it was found
+            with app.app_context():
+                Attendance.query.filter(
+                    Attendance.student_id == student_id,
+                    Attendance.id > last_attendance_id
+                ).delete(synchronize_session=False)
+                db.session.delete(db.session.get(Student, student_id))
+                db.session.commit()
+            print("\n   🧹 Removed the test student and its attendance rows")
+
+    if tmpdir:
+        import shutil
+        shutil.rmtree(tmpdir, ignore_errors=True)
+
+    if errors or read_counts[1]:
+        sys.exit(1)
+    print("\n🎉 No \"database is locked\" failures.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+"""
+Test script for kiosk mode
+Runs the kiosk on two looping local video files standing in for RTSP cameras
+Run: python test_kiosk.py
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+
+def make_video(path, color, frames=20):
+    import cv2
+    import numpy as np
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'MJPG'), 30, (320, 240))
+    for i in range(frames):
+        frame = np.full((240, 320, 3), color, dtype=np.uint8)
+        cv2.putText(frame, str(i), (20, 120), cv2.FONT_HERSHEY_SIMPLEX, 2, (255, 255, 255), 3)
+        writer.write(frame)
+    writer.release()
+
+
+def main():
+    tmpdir = tempfile.mkdtemp(prefix='kiosk_test_')
+    # Keep the real database untouched and don't let app.py start its own kiosk
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tmpdir, 'kiosk.db')
+    os.environ.pop('KIOSK_SOURCES', None)
+
+    print("🔍 Testing Kiosk Mode...\n")
+
+    import cv2
+    import kiosk as kiosk_module
+    from app import app, load_known_faces, encode_student_face
+
+    sources = [os.path.join(tmpdir, 'cam0.avi'), os.path.join(tmpdir, 'cam1.avi')]
+    make_video(sources[0], (40, 40, 160))
+    make_video(sources[1], (160, 40, 40))
+
+    # Count every capture the kiosk opens and every gallery load
+    opened = []
+    real_capture = cv2.VideoCapture
+
+    def counting_capture(source, *args):
+        opened.append(source)
+        return real_capture(source, *args)
+
+    loads = []
+
+    def counting_loader(recognizer):
+        loads.append(1)
+        return load_known_faces(recognizer)
+
+    cv2.VideoCapture = counting_capture
+    k = kiosk_module.Kiosk(app, counting_loader, encode_student_face, sources, workers=2)
+
+    dispatched = []
+    recognize = k.scheduler.recognize
+
+    def recording_recognize(recognizer, frame, camera):
+        dispatched.append(camera.index)
+        return recognize(recognizer, frame, camera)
+
+    k.scheduler.recognize = recording_recognize
+
+    failed = False
+    try:
+        k.start()
+
+        # Test 1: two viewers of one camera
+        print("1️⃣ Streaming camera 1 to two viewers...")
+        viewers = [k.camera(0).stream(), k.camera(0).stream()]
+        parts = [0, 0]
+        deadline = time.time() + 5
+        while time.time() < deadline and min(parts) < 10:
+            for i, viewer in enumerate(viewers):
+                part = next(viewer)
+                if part.startswith(b'--frame\r\nContent-Type: image/jpeg\r\n\r\n'):
+                    parts[i] += 1
+        for viewer in viewers:
+            viewer.close()
+        if min(parts) >= 10:
+            print(f"   ✅ Both viewers received parts ({parts[0]} and {parts[1]})")
+        else:
+            print(f"   ❌ Viewers received too few parts: {parts}")
+            failed = True
+        if opened.count(sources[0]) == 1 and opened.count(sources[1]) == 1:
+            print("   ✅ Each source was opened once")
+        else:
+            print(f"   ❌ Sources opened more than once: {opened}")
+            failed = True
+
+        # Test 2: round-robin dispatch
+        print("\n2️⃣ Checking round-robin inference...")
+        counts = [dispatched.count(0), dispatched.count(1)]
+        if min(counts) > 0 and min(counts) >= max(counts) * 0.5:
+            print(f"   ✅ Frames dispatched from both cameras ({counts[0]} and {counts[1]})")
+        else:
+            print(f"   ❌ Dispatch is unbalanced: {counts}")
+            failed = True
+
+        # Test 3: one shared gallery
+        print("\n3️⃣ Checking shared gallery...")
+        if len(loads) == 1 and k.scheduler.gallery is k.gallery:
+            print("   ✅ Gallery loaded once and shared by all workers")
+        else:
+            print(f"   ❌ Gallery loaded {len(loads)} times")
+            failed = True
+    finally:
+        k.stop()
+        cv2.VideoCapture = real_capture
+        import shutil
+        shutil.rmtree(tmpdir, ignore_errors=True)
+
+    if failed:
+        sys.exit(1)
+    print("\n🎉 Kiosk tests passed!")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+"""
+Test script for MJPEG encoding and adaptive stream quality
+No camera needed
+Run: python test_mjpeg.py
+"""
+
+import sys
+
+
+def main():
+    import cv2
+    import numpy as np
+    from mjpeg import FrameEncoder, AdaptiveRate, StreamSettings, PART_HEADER, PART_FOOTER
+
+    print("🔍 Testing MJPEG Encoding...\n")
+    failed = False
+
+    def check(ok, passed, message):
+        nonlocal failed
+        if ok:
+            print(f"   ✅ {passed}")
+        else:
+            print(f"   ❌ {message}")
+            failed = True
+
+    # Count real JPEG encodes
+    encodes = []
+    real_imencode = cv2.imencode
+
+    def counting_imencode(*args, **kwargs):
+        encodes.append(1)
+        return real_imencode(*args, **kwargs)
+
+    cv2.imencode = counting_imencode
+    try:
+        settings = StreamSettings(width=320, quality=80, min_quality=40, max_fps=10, min_fps=2)
+        frame = np.random.randint(0, 255, (480, 640, 3), dtype=np.uint8)
+        moved = np.roll(frame, 200, axis=1)
+
+        # Test 1: caching
+        print("1️⃣ Checking encode cache...")
+        encoder = FrameEncoder(settings)
+        first, _ = encoder.encode(frame)
+        second, encode_time = encoder.encode(frame.copy())
+        check(second is first and len(encodes) == 1 and encode_time == 0.0,
+              "Identical frame reuses the cached part", f"Identical frame was encoded again ({len(encodes)} encodes)")
+
+        encoder = FrameEncoder(settings)
+        del encodes[:]
+        a, _ = encoder.encode(frame, 80, frame_id=1)
+        b, _ = encoder.encode(moved, 80, frame_id=2)
+        stale, _ = encoder.encode(frame, 80, frame_id=1)
+        check(stale is a and b is not a and len(encodes) == 2,
+              "Viewers out of step share the part for one frame id",
+              f"Frame id 1 was encoded again ({len(encodes)} encodes)")
+
+        # Test 2: downscaling
+        print("\n2️⃣ Checking output width...")
+        jpeg = np.frombuffer(first[len(PART_HEADER):-len(PART_FOOTER)], np.uint8)
+        decoded = cv2.imdecode(jpeg, cv2.IMREAD_COLOR)
+        check(decoded.shape[:2] == (240, 320), "Frame downscaled to 320x240", f"Got size {decoded.shape[:2]}")
+    finally:
+        cv2.imencode = real_imencode
+
+    # Test 3: adaptive rate
+    print("\n3️⃣ Checking adaptive quality and frame rate...")
+    rate = AdaptiveRate(settings)
+    rate.sent(1.0)
+    check(rate.quality == 70 and rate.fps == 10, "Slow client loses quality first",
+          f"quality={rate.quality} fps={rate.fps}")
+    for _ in range(10):
+        rate.sent(1.0)
+    check(rate.quality == 40 and rate.fps < 10, "Frame rate drops once quality is at its minimum",
+          f"quality={rate.quality} fps={rate.fps}")
+    for _ in range(50):
+        rate.sent(0.0)
+    check(rate.quality == 80 and rate.fps == 10, "Fast client gets quality and frame rate back",
+          f"quality={rate.quality} fps={rate.fps}")
+
+    if failed:
+        sys.exit(1)
+    print("\n🎉 MJPEG tests passed!")
+
+
+if __name__ == '__main__':
+    main()